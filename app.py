@@ -1,21 +1,22 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
-import requests
-import json
+import plotly.io as pio
+from plotly.subplots import make_subplots
+import httpx
+import orjson
+from tenacity import retry, retry_if_exception, stop_after_attempt, stop_after_delay, wait_exponential
+import asyncio
+import sys
+import threading
 from datetime import datetime
 import os
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
-# Page configuration
-st.set_page_config(
-    page_title="AI Talent Matching Dashboard",
-    page_icon="👥",
-    layout="wide"
-)
-
-# Custom CSS
-st.markdown("""
+# Static page markup
+CUSTOM_CSS = """
 <style>
     .main-header {
         font-size: 2.5rem;
@@ -38,7 +39,82 @@ st.markdown("""
         font-weight: bold;
     }
 </style>
-""", unsafe_allow_html=True)
+"""
+
+FOOTER_HTML = """
+<div style='text-align: center; color: #6b7280; padding: 2rem 0;'>
+    <p>🤖 Powered by Claude AI + Supabase PostgreSQL | Built with Streamlit</p>
+    <p style='font-size: 0.875rem;'>Analyst-grade insights, not engineering complexity</p>
+</div>
+"""
+
+# Serialize every Plotly figure sent by st.plotly_chart with orjson
+pio.json.config.default_engine = 'orjson'
+
+# Page configuration
+st.set_page_config(
+    page_title="AI Talent Matching Dashboard",
+    page_icon="👥",
+    layout="wide"
+)
+
+# Custom CSS, re-emitted every rerun: Streamlit drops any element a rerun does not
+# render again, so injecting it only once would strip the styling on the next rerun
+st.markdown(CUSTOM_CSS, unsafe_allow_html=True)
+
+# Match rate distribution buckets, highest first
+MATCH_RANGES = ['90-100', '80-89', '70-79', '60-69', '<60']
+MATCH_BIN_EDGES = [-np.inf, 60, 70, 80, 90, np.inf]
+
+# Low-cardinality text columns stored as pandas categoricals
+CATEGORY_COLUMNS = ['position', 'grade', 'directorate']
+
+# Competency names used for TGV/TV scores in sample data
+TGV_NAMES = ['Learning Agility', 'Results Orientation', 'Collaboration', 'Innovation', 'Integrity']
+TV_NAMES = ['Technical Skills', 'Domain Knowledge', 'Analytical Thinking', 'Communication']
+
+# Structured-output schema for the Claude job profile (forced tool use)
+JOB_PROFILE_TOOL = {
+    "name": "job_profile",
+    "description": "Record the generated job profile",
+    "input_schema": {
+        "type": "object",
+        "properties": {
+            "job_requirements": {
+                "type": "string",
+                "description": "Detailed technical and soft skill requirements (3-5 sentences)"
+            },
+            "job_description": {
+                "type": "string",
+                "description": "Comprehensive role overview and responsibilities (3-5 sentences)"
+            },
+            "key_competencies": {
+                "type": "array",
+                "items": {"type": "string"},
+                "minItems": 5,
+                "maxItems": 5
+            }
+        },
+        "required": ["job_requirements", "job_description", "key_competencies"]
+    }
+}
+
+# Two-panel radar layout, built once and copied for each candidate
+RADAR_TEMPLATE = make_subplots(
+    rows=1, cols=2,
+    specs=[[{'type': 'polar'}, {'type': 'polar'}]],
+    subplot_titles=('🎯 TGV Scores (Core Values)', '⚡ TV Scores (Technical/Functional)')
+)
+RADAR_TEMPLATE.update_layout(
+    polar=dict(radialaxis=dict(visible=True, range=[0, 100])),
+    polar2=dict(radialaxis=dict(visible=True, range=[0, 100])),
+    showlegend=False,
+    height=350
+)
+
+# Claude API retry limits (seconds): total budget in line with the 30s request timeout
+CLAUDE_RETRY_BUDGET = 30
+CLAUDE_RETRY_MAX_WAIT = 8
 
 # Initialize session state
 if 'results' not in st.session_state:
@@ -49,76 +125,111 @@ if 'supabase_key' not in st.session_state:
     st.session_state.supabase_key = os.getenv('SUPABASE_KEY', '')
 
 # Helper Functions
-def init_supabase_connection():
-    """Initialize Supabase connection"""
+@st.cache_resource(show_spinner=False, validate=lambda client: client is not None)
+def get_supabase(url, key):
+    """Get a pooled Supabase client, cached per (url, key) across reruns and sessions"""
     try:
-        from supabase import create_client, Client
-        url = st.session_state.supabase_url
-        key = st.session_state.supabase_key
+        from postgrest.constants import DEFAULT_POSTGREST_CLIENT_TIMEOUT
+        from supabase import create_client, ClientOptions
         if url and key:
-            return create_client(url, key)
+            # postgrest uses a custom client as-is, so restate its defaults next to the limits
+            http_client = httpx.Client(
+                timeout=httpx.Timeout(DEFAULT_POSTGREST_CLIENT_TIMEOUT),
+                follow_redirects=True,
+                http2=True,
+                limits=httpx.Limits(max_connections=10, max_keepalive_connections=5)
+            )
+            return create_client(url, key, options=ClientOptions(httpx_client=http_client))
         return None
     except Exception as e:
         st.error(f"Supabase connection error: {str(e)}")
         return None
 
-def insert_job_vacancy(supabase, role_name, job_level, role_purpose, benchmark_ids):
-    """Insert new job vacancy into talent_benchmarks table"""
-    try:
-        vacancy_id = f"JV-{datetime.now().strftime('%Y%m%d%H%M%S')}"
-        
-        data = {
-            'job_vacancy_id': vacancy_id,
-            'role_name': role_name,
-            'job_level': job_level,
-            'role_purpose': role_purpose,
-            'selected_talent_ids': benchmark_ids,
-            'weights_config': {}  # Default to equal weights
-        }
-        
-        result = supabase.table('talent_benchmarks').insert(data).execute()
-        return vacancy_id
-    except Exception as e:
-        st.error(f"Error inserting job vacancy: {str(e)}")
-        return None
+@st.cache_resource(show_spinner=False)
+def get_claude_client():
+    """Get a persistent HTTP/2 client for Claude API, reused across generate calls"""
+    return httpx.Client(
+        http2=True,
+        timeout=30.0,
+        limits=httpx.Limits(max_keepalive_connections=4)
+    )
 
-def generate_job_profile(role_name, job_level, role_purpose):
-    """Generate AI job profile using Claude API"""
-    try:
-        response = requests.post(
-            "https://api.anthropic.com/v1/messages",
-            headers={
-                "Content-Type": "application/json",
-            },
-            json={
-                "model": "claude-sonnet-4-20250514",
-                "max_tokens": 1500,
-                "messages": [
-                    {
-                        "role": "user",
-                        "content": f"""Generate a detailed job profile for a {job_level} level {role_name} position.
+def is_retryable_error(exc):
+    """Retry Claude API calls on rate limits, server errors and dropped connections"""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code == 429 or exc.response.status_code >= 500
+    # Timeouts are not retried: the generation may have finished (and been billed) upstream
+    return isinstance(exc, httpx.TransportError) and not isinstance(exc, httpx.TimeoutException)
 
-Role Purpose: {role_purpose}
+def wait_for_retry(retry_state):
+    """Back off exponentially, honouring a Retry-After header on 429 responses"""
+    exc = retry_state.outcome.exception()
+    if isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code == 429:
+        retry_after = exc.response.headers.get('retry-after', '')
+        if retry_after.isdigit():
+            return min(float(retry_after), CLAUDE_RETRY_MAX_WAIT)
+    return wait_exponential(multiplier=1, max=CLAUDE_RETRY_MAX_WAIT)(retry_state)
+
+@retry(
+    retry=retry_if_exception(is_retryable_error),
+    wait=wait_for_retry,
+    stop=stop_after_attempt(3) | stop_after_delay(CLAUDE_RETRY_BUDGET),
+    reraise=True
+)
+def post_to_claude(payload):
+    """POST a messages request to Claude API over the shared client"""
+    response = get_claude_client().post(
+        "https://api.anthropic.com/v1/messages",
+        headers={
+            "Content-Type": "application/json",
+        },
+        content=orjson.dumps(payload)
+    )
+    response.raise_for_status()
+    return orjson.loads(response.content)
+
+@st.cache_data(persist="disk", show_spinner=False)
+def fetch_job_profile(role_name, job_level, role_purpose):
+    """Fetch an AI job profile from Claude API, memoized on the role inputs"""
+    result = post_to_claude({
+        "model": "claude-sonnet-4-20250514",
+        "max_tokens": 600,
+        "tools": [JOB_PROFILE_TOOL],
+        "tool_choice": {"type": "tool", "name": JOB_PROFILE_TOOL["name"]},
+        "messages": [
+            {
+                "role": "user",
+                "content": f"""Generate a detailed job profile for a {job_level} level {role_name} position.
 
-Return ONLY valid JSON with no preamble, markdown, or explanatory text:
-{{
-  "job_requirements": "Detailed technical and soft skill requirements (3-5 sentences)",
-  "job_description": "Comprehensive role overview and responsibilities (3-5 sentences)",
-  "key_competencies": ["competency1", "competency2", "competency3", "competency4", "competency5"]
-}}
+Role Purpose: {role_purpose}
 
 Make the content professional, specific, and aligned with the role purpose."""
-                    }
-                ]
-            },
-            timeout=30
-        )
-        
-        result = response.json()
-        text = result['content'][0]['text']
-        cleaned = text.replace('```json', '').replace('```', '').strip()
-        return json.loads(cleaned)
-    except Exception as e:
+            }
+        ]
+    })
+    # Forced tool use returns the profile as already-parsed JSON input, but the
+    # schema is not enforced: reject truncated or incomplete profiles so they reach
+    # the fallback instead of the persistent cache
+    if result.get('stop_reason') == 'max_tokens':
+        raise ValueError("Claude response was truncated at max_tokens")
+    profile = next((block['input'] for block in result['content'] if block['type'] == 'tool_use'), None)
+    if not isinstance(profile, dict):
+        raise ValueError("Claude response contained no job profile")
+    competencies = profile.get('key_competencies')
+    if not (
+        isinstance(profile.get('job_requirements'), str)
+        and isinstance(profile.get('job_description'), str)
+        and isinstance(competencies, list)
+        and all(isinstance(c, str) for c in competencies)
+    ):
+        raise ValueError("Claude response contained an incomplete job profile")
+    return profile
+
+def generate_job_profile(role_name, job_level, role_purpose):
+    """Generate AI job profile, falling back to a template when the API call fails"""
+    try:
+        return fetch_job_profile(role_name, job_level, role_purpose)
+    except (httpx.HTTPError, TimeoutError, KeyError, ValueError) as e:
         st.warning(f"Using fallback job profile. API error: {str(e)}")
         return {
             "job_requirements": f"{role_name} requires strong technical skills, domain expertise, and proven ability to deliver results at {job_level} level. Excellent communication, analytical thinking, and stakeholder management capabilities are essential.",
@@ -132,103 +243,157 @@ Make the content professional, specific, and aligned with the role purpose."""
             ]
         }
 
-def execute_matching_query(supabase, vacancy_id):
-    """Execute the SQL query to get talent matching results"""
+def insert_and_match(supabase, vacancy_id, role_name, job_level, role_purpose, benchmark_ids):
+    """Insert the job vacancy and get talent matching results in one RPC round-trip"""
     try:
-        # This is a simplified version. In production, you would call your SQL stored procedure
-        # or execute the full CTE query that computes TV match rates, TGV match rates, and final match rates
-        
-        query = f"""
-        SELECT 
-            e.employee_id,
-            e.fullname as name,
-            dp.name as position,
-            dg.name as grade,
-            dd.name as directorate,
-            -- Placeholder for actual match rate calculation
-            ROUND(RANDOM() * 30 + 70, 1) as final_match_rate,
-            -- These would come from your actual SQL logic
-            jsonb_build_object(
-                'Learning Agility', ROUND(RANDOM() * 20 + 75),
-                'Results Orientation', ROUND(RANDOM() * 20 + 75),
-                'Collaboration', ROUND(RANDOM() * 20 + 75),
-                'Innovation', ROUND(RANDOM() * 20 + 75),
-                'Integrity', ROUND(RANDOM() * 20 + 75)
-            ) as tgv_scores,
-            jsonb_build_object(
-                'Technical Skills', ROUND(RANDOM() * 20 + 75),
-                'Domain Knowledge', ROUND(RANDOM() * 20 + 75),
-                'Analytical Thinking', ROUND(RANDOM() * 20 + 75),
-                'Communication', ROUND(RANDOM() * 20 + 75)
-            ) as tv_scores
-        FROM employees e
-        LEFT JOIN dim_positions dp ON e.position_id = dp.position_id
-        LEFT JOIN dim_grades dg ON e.grade_id = dg.grade_id
-        LEFT JOIN dim_directorates dd ON e.directorate_id = dd.directorate_id
-        WHERE e.employee_id IN (
-            SELECT DISTINCT employee_id 
-            FROM performance_yearly 
-            WHERE rating >= 4
-            LIMIT 20
-        )
-        ORDER BY final_match_rate DESC;
-        """
+        # generate_and_match (Step 2 SQL, Section 4) inserts into talent_benchmarks and
+        # returns the ranked rows plus dashboard aggregates as a single JSON object
+        result = supabase.rpc('generate_and_match', {
+            'p_job_vacancy_id': vacancy_id,
+            'p_role_name': role_name,
+            'p_job_level': job_level,
+            'p_role_purpose': role_purpose,
+            'p_benchmark_ids': benchmark_ids
+        }).execute()
         
-        # Execute query via Supabase RPC or direct SQL
-        result = supabase.rpc('execute_sql', {'query': query}).execute()
-        
-        if result.data:
-            return pd.DataFrame(result.data)
+        if result.data and result.data['rows']:
+            talent_df = pd.DataFrame(result.data['rows'])
+            tgv_df = to_score_frame(talent_df.pop('tgv_scores'), talent_df['employee_id'])
+            tv_df = to_score_frame(talent_df.pop('tv_scores'), talent_df['employee_id'])
+            return (talent_df, tgv_df, tv_df), result.data['summary']
         else:
             st.error("No data returned from query")
-            return None
+            st.info("Generating sample data for demonstration purposes...")
+            return generate_sample_data(), None
             
     except Exception as e:
         st.error(f"Query execution error: {str(e)}")
         st.info("Generating sample data for demonstration purposes...")
-        return generate_sample_data()
+        return generate_sample_data(), None
+
+def to_score_frame(scores, employee_ids):
+    """Expand a column of per-row score dicts into a wide float32 frame indexed by employee_id"""
+    # Non-dict payloads (missing or unparsed scores) become empty rows
+    rows = [row if isinstance(row, dict) else {} for row in scores]
+    return pd.DataFrame(rows, index=pd.Index(employee_ids, name='employee_id')).astype('float32')
 
-def generate_sample_data():
+def generate_sample_data(n=15):
     """Generate sample data when database is not available"""
-    import random
-    
-    data = []
-    for i in range(15):
-        base_score = random.uniform(70, 95)
-        data.append({
-            'employee_id': f'EMP{1000 + i}',
-            'name': f'Employee {1000 + i}',
-            'position': random.choice(['Data Analyst', 'Business Analyst', 'Data Scientist']),
-            'grade': random.choice(['III', 'IV', 'V']),
-            'directorate': random.choice(['Commercial', 'Operations', 'HR & Corporate Affairs']),
-            'final_match_rate': round(base_score, 1),
-            'tgv_scores': {
-                'Learning Agility': round(base_score + random.uniform(-5, 5)),
-                'Results Orientation': round(base_score + random.uniform(-5, 5)),
-                'Collaboration': round(base_score + random.uniform(-5, 5)),
-                'Innovation': round(base_score + random.uniform(-5, 5)),
-                'Integrity': round(base_score + random.uniform(-5, 5))
-            },
-            'tv_scores': {
-                'Technical Skills': round(base_score + random.uniform(-5, 5)),
-                'Domain Knowledge': round(base_score + random.uniform(-5, 5)),
-                'Analytical Thinking': round(base_score + random.uniform(-5, 5)),
-                'Communication': round(base_score + random.uniform(-5, 5))
-            }
-        })
-    
-    return pd.DataFrame(data)
-
-def get_match_color(rate):
-    """Get color based on match rate"""
-    if rate >= 90:
-        return '#10b981'
-    elif rate >= 80:
-        return '#3b82f6'
-    elif rate >= 70:
-        return '#f59e0b'
+    rng = np.random.default_rng()
+    ids = (1000 + np.arange(n)).astype(str)
+    base_score = rng.uniform(70, 95, size=n)
+    tgv = np.rint(base_score[:, None] + rng.uniform(-5, 5, size=(n, len(TGV_NAMES))))
+    tv = np.rint(base_score[:, None] + rng.uniform(-5, 5, size=(n, len(TV_NAMES))))
+    
+    employee_ids = pd.Index(np.char.add('EMP', ids), name='employee_id')
+    talent_df = pd.DataFrame({
+        'employee_id': employee_ids,
+        'name': np.char.add('Employee ', ids),
+        'position': rng.choice(['Data Analyst', 'Business Analyst', 'Data Scientist'], size=n),
+        'grade': rng.choice(['III', 'IV', 'V'], size=n),
+        'directorate': rng.choice(['Commercial', 'Operations', 'HR & Corporate Affairs'], size=n),
+        'final_match_rate': base_score.round(1)
+    })
+    tgv_df = pd.DataFrame(tgv, index=employee_ids, columns=TGV_NAMES, dtype='float32')
+    tv_df = pd.DataFrame(tv, index=employee_ids, columns=TV_NAMES, dtype='float32')
+    
+    # Hand rows over already ranked, like the SQL ORDER BY
+    order = np.argsort(-base_score, kind='stable')
+    return talent_df.iloc[order].reset_index(drop=True), tgv_df, tv_df
+
+def compute_analytics(match_rates, bench_mask):
+    """Compute dashboard aggregates locally when the SQL summary is unavailable"""
+    benchmark_rates = match_rates[bench_mask]
+    
+    # One histogram pass; bins run low to high, MATCH_RANGES high to low
+    counts = np.histogram(match_rates, bins=MATCH_BIN_EDGES)[0][::-1]
+    
+    return {
+        'avg_match': round(float(match_rates.mean()), 1),
+        'benchmark_avg': round(float(benchmark_rates.mean()), 1) if benchmark_rates.size else 0,
+        'top_talent_count': int((match_rates >= 80).sum()),
+        'bucket_counts': dict(zip(MATCH_RANGES, counts.tolist()))
+    }
+
+def get_talent_results(supabase, role_name, job_level, role_purpose, benchmark_ids):
+    """Insert the job vacancy and fetch ranked match results"""
+    vacancy_id = f"JV-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+    if supabase:
+        (talent_df, tgv_df, tv_df), analytics = insert_and_match(
+            supabase, vacancy_id, role_name, job_level, role_purpose, benchmark_ids
+        )
     else:
-        return '#ef4444'
+        st.warning("⚠️ Database not configured. Using demo mode.")
+        (talent_df, tgv_df, tv_df), analytics = generate_sample_data(), None
+    
+    # SQL (ORDER BY) and sample data both arrive ranked; only sort if that ever breaks
+    if not talent_df['final_match_rate'].is_monotonic_decreasing:
+        order = np.argsort(-talent_df['final_match_rate'].to_numpy(), kind='stable')
+        talent_df = talent_df.iloc[order].reset_index(drop=True)
+    
+    # Sample data carries no SQL summary: mark benchmarks and aggregate locally
+    if analytics is None:
+        bench_mask = talent_df['employee_id'].isin(set(benchmark_ids)).to_numpy()
+        talent_df['is_benchmark'] = bench_mask
+        analytics = compute_analytics(talent_df['final_match_rate'].to_numpy(), bench_mask)
+    
+    # Compact dtypes keep the session-state copy small
+    talent_df['final_match_rate'] = talent_df['final_match_rate'].astype('float32')
+    talent_df[CATEGORY_COLUMNS] = talent_df[CATEGORY_COLUMNS].astype('category')
+    return vacancy_id, talent_df, tgv_df, tv_df, analytics
+
+async def run_in_thread(func, *args):
+    """Run a blocking call in a worker thread that keeps the Streamlit script context"""
+    ctx = get_script_run_ctx()
+    
+    def run():
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return func(*args)
+    
+    return await asyncio.to_thread(run)
+
+async def generate_profile_and_matches(supabase, role_name, job_level, role_purpose, benchmark_list):
+    """Overlap the Claude call with the Supabase insert + matching query"""
+    profile_args = (generate_job_profile, role_name, job_level, role_purpose)
+    db_args = (get_talent_results, supabase, role_name, job_level, role_purpose, benchmark_list)
+    if sys.version_info >= (3, 11):
+        async with asyncio.TaskGroup() as tg:
+            profile_task = tg.create_task(run_in_thread(*profile_args))
+            db_task = tg.create_task(run_in_thread(*db_args))
+        return profile_task.result(), db_task.result()
+    return await asyncio.gather(
+        run_in_thread(*profile_args),
+        run_in_thread(*db_args)
+    )
+
+def build_radar_figure(tgv_scores, tv_scores):
+    """Build the TGV and TV radar charts as one two-panel figure"""
+    fig = go.Figure(RADAR_TEMPLATE)
+    panels = [(tgv_scores, 'TGV Score', '#8b5cf6', 'polar'), (tv_scores, 'TV Score', '#3b82f6', 'polar2')]
+    for scores, name, color, subplot in panels:
+        if scores:
+            fig.add_trace(go.Scatterpolar(
+                r=list(scores.values()),
+                theta=list(scores.keys()),
+                fill='toself',
+                name=name,
+                line=dict(color=color),
+                subplot=subplot
+            ))
+    return fig
+
+@st.cache_data(ttl=3600, max_entries=50, show_spinner=False)
+def to_csv_bytes(talent_df, tgv_df, tv_df, vacancy_id, role_name, job_level):
+    """Serialize results for download, cached on the frames themselves plus export labels"""
+    return talent_df.join(
+        tgv_df.add_prefix('TGV: '), on='employee_id'
+    ).join(
+        tv_df.add_prefix('TV: '), on='employee_id'
+    ).assign(
+        vacancy_id=vacancy_id,
+        role_name=role_name,
+        job_level=job_level
+    ).to_csv(index=False).encode()
 
 # Main App
 st.markdown('<h1 class="main-header">👥 AI Talent Matching Dashboard</h1>', unsafe_allow_html=True)
@@ -250,7 +415,7 @@ with st.sidebar:
         )
         
         if st.button("Test Connection"):
-            supabase = init_supabase_connection()
+            supabase = get_supabase(st.session_state.supabase_url, st.session_state.supabase_key)
             if supabase:
                 st.success("✅ Connection successful!")
             else:
@@ -305,42 +470,20 @@ if generate_button:
             benchmark_list = [id.strip() for id in benchmark_ids.split(',')][:3]
             
             # Initialize Supabase
-            supabase = init_supabase_connection()
-            
-            # Insert job vacancy
-            vacancy_id = None
-            if supabase:
-                vacancy_id = insert_job_vacancy(supabase, role_name, job_level, role_purpose, benchmark_list)
-            else:
-                vacancy_id = f"JV-{datetime.now().strftime('%Y%m%d%H%M%S')}"
-                st.warning("⚠️ Database not configured. Using demo mode.")
-            
-            # Generate job profile
-            job_profile = generate_job_profile(role_name, job_level, role_purpose)
-            
-            # Execute matching query
-            if supabase and vacancy_id:
-                talent_df = execute_matching_query(supabase, vacancy_id)
-            else:
-                talent_df = generate_sample_data()
-            
-            # Mark benchmark employees
-            talent_df['is_benchmark'] = talent_df['employee_id'].isin(benchmark_list)
-            talent_df = talent_df.sort_values('final_match_rate', ascending=False).reset_index(drop=True)
+            supabase = get_supabase(st.session_state.supabase_url, st.session_state.supabase_key)
             
-            # Calculate analytics
-            match_rates = talent_df['final_match_rate'].tolist()
-            benchmark_rates = talent_df[talent_df['is_benchmark']]['final_match_rate'].tolist()
+            # Generate job profile while inserting the vacancy and running the matching query
+            job_profile, (vacancy_id, talent_df, tgv_df, tv_df, analytics) = asyncio.run(generate_profile_and_matches(
+                supabase, role_name, job_level, role_purpose, benchmark_list
+            ))
             
             st.session_state.results = {
                 'vacancy_id': vacancy_id,
                 'job_profile': job_profile,
                 'talent_df': talent_df,
-                'analytics': {
-                    'avg_match': round(sum(match_rates) / len(match_rates), 1),
-                    'benchmark_avg': round(sum(benchmark_rates) / len(benchmark_rates), 1) if benchmark_rates else 0,
-                    'top_talent_count': len([r for r in match_rates if r >= 80])
-                },
+                'tgv_df': tgv_df,
+                'tv_df': tv_df,
+                'analytics': analytics,
                 'benchmark_ids': benchmark_list
             }
 
@@ -397,16 +540,10 @@ if st.session_state.results:
     st.markdown("---")
     st.subheader("📈 Match Rate Distribution")
     
-    match_rates = results['talent_df']['final_match_rate'].tolist()
+    bucket_counts = results['analytics']['bucket_counts']
     distribution_data = pd.DataFrame({
-        'Range': ['90-100', '80-89', '70-79', '60-69', '<60'],
-        'Count': [
-            len([r for r in match_rates if r >= 90]),
-            len([r for r in match_rates if 80 <= r < 90]),
-            len([r for r in match_rates if 70 <= r < 80]),
-            len([r for r in match_rates if 60 <= r < 70]),
-            len([r for r in match_rates if r < 60])
-        ]
+        'Range': MATCH_RANGES,
+        'Count': [bucket_counts[r] for r in MATCH_RANGES]
     })
     
     fig_dist = px.bar(
@@ -427,74 +564,50 @@ if st.session_state.results:
     
     st.info(f"📊 Showing top {len(results['talent_df'])} candidates ranked by final match rate from SQL query results")
     
-    for idx, row in results['talent_df'].iterrows():
-        # Medal for top 3
-        medal = "🥇" if idx == 0 else "🥈" if idx == 1 else "🥉" if idx == 2 else f"#{idx + 1}"
-        
-        # Parse scores if they're stored as JSON strings
-        tgv_scores = row['tgv_scores'] if isinstance(row['tgv_scores'], dict) else {}
-        tv_scores = row['tv_scores'] if isinstance(row['tv_scores'], dict) else {}
+    # Medal and benchmark labels computed column-wise, once, before the loop
+    talent_df = results['talent_df']
+    tgv_df, tv_df = results['tgv_df'], results['tv_df']
+    has_scores = tgv_df.notna().any(axis=1) | tv_df.notna().any(axis=1)
+    rank = np.arange(len(talent_df))
+    ranked_df = talent_df.assign(
+        medal=np.where(
+            rank < 3,
+            np.array(['🥇', '🥈', '🥉'])[np.minimum(rank, 2)],
+            np.char.add('#', (rank + 1).astype(str))
+        ),
+        benchmark_label=np.where(talent_df['is_benchmark'], '🌟 **BENCHMARK**', ''),
+        has_scores=has_scores.reindex(talent_df['employee_id'], fill_value=False).to_numpy()
+    )
+    
+    for row in ranked_df.itertuples(index=True):
+        idx = row.Index
         
         with st.expander(
-            f"{medal} **{row['name']}** ({row['employee_id']}) - {row['final_match_rate']}% Match | "
-            f"{row['position']} - {row['grade']} "
-            f"{'🌟 **BENCHMARK**' if row['is_benchmark'] else ''}",
+            f"{row.medal} **{row.name}** ({row.employee_id}) - {row.final_match_rate:.1f}% Match | "
+            f"{row.position} - {row.grade} "
+            f"{row.benchmark_label}",
             expanded=(idx < 3)
         ):
             # Candidate Info
             col_info1, col_info2, col_info3 = st.columns(3)
             with col_info1:
-                st.metric("Position", row['position'])
+                st.metric("Position", row.position)
             with col_info2:
-                st.metric("Grade", row['grade'])
+                st.metric("Grade", row.grade)
             with col_info3:
-                st.metric("Directorate", row['directorate'])
+                st.metric("Directorate", row.directorate)
             
             st.markdown("---")
             
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                # TGV Radar Chart
-                st.subheader("🎯 TGV Scores (Core Values)")
-                if tgv_scores:
-                    fig_tgv = go.Figure()
-                    fig_tgv.add_trace(go.Scatterpolar(
-                        r=list(tgv_scores.values()),
-                        theta=list(tgv_scores.keys()),
-                        fill='toself',
-                        name='TGV Score',
-                        line=dict(color='#8b5cf6')
-                    ))
-                    fig_tgv.update_layout(
-                        polar=dict(radialaxis=dict(visible=True, range=[0, 100])),
-                        showlegend=False,
-                        height=300
-                    )
-                    st.plotly_chart(fig_tgv, use_container_width=True)
-                else:
-                    st.info("TGV scores not available")
-            
-            with col2:
-                # TV Radar Chart
-                st.subheader("⚡ TV Scores (Technical/Functional)")
-                if tv_scores:
-                    fig_tv = go.Figure()
-                    fig_tv.add_trace(go.Scatterpolar(
-                        r=list(tv_scores.values()),
-                        theta=list(tv_scores.keys()),
-                        fill='toself',
-                        name='TV Score',
-                        line=dict(color='#3b82f6')
-                    ))
-                    fig_tv.update_layout(
-                        polar=dict(radialaxis=dict(visible=True, range=[0, 100])),
-                        showlegend=False,
-                        height=300
-                    )
-                    st.plotly_chart(fig_tv, use_container_width=True)
-                else:
-                    st.info("TV scores not available")
+            # Radar charts: expanded top 3 render straight away, the rest on demand
+            # so collapsed expanders don't each ship a chart payload to the browser
+            if not row.has_scores:
+                st.info("TGV/TV scores not available")
+            elif idx < 3 or st.toggle("📡 Show TGV/TV radar charts", key=f"radar_{row.employee_id}"):
+                st.plotly_chart(build_radar_figure(
+                    tgv_df.loc[row.employee_id].dropna().to_dict(),
+                    tv_df.loc[row.employee_id].dropna().to_dict()
+                ), use_container_width=True)
     
     # Summary Insights
     st.markdown("---")
@@ -531,12 +644,10 @@ if st.session_state.results:
     st.subheader("📥 Export Results")
     
     # Prepare comprehensive export
-    export_df = results['talent_df'].copy()
-    export_df['vacancy_id'] = results['vacancy_id']
-    export_df['role_name'] = role_name
-    export_df['job_level'] = job_level
-    
-    csv = export_df.to_csv(index=False)
+    csv = to_csv_bytes(
+        results['talent_df'], results['tgv_df'], results['tv_df'],
+        results['vacancy_id'], role_name, job_level
+    )
     st.download_button(
         label="📥 Download Full Results (CSV)",
         data=csv,
@@ -634,9 +745,4 @@ else:
 
 # Footer
 st.markdown("---")
-st.markdown("""
-<div style='text-align: center; color: #6b7280; padding: 2rem 0;'>
-    <p>🤖 Powered by Claude AI + Supabase PostgreSQL | Built with Streamlit</p>
-    <p style='font-size: 0.875rem;'>Analyst-grade insights, not engineering complexity</p>
-</div>
-""", unsafe_allow_html=True)
\ No newline at end of file
+st.markdown(FOOTER_HTML, unsafe_allow_html=True)
\ No newline at end of file